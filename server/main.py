@@ -2,17 +2,25 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import heapq
+import itertools
 import json
 import logging
 import os
 import time
+from collections.abc import Coroutine, Iterable
 from dataclasses import dataclass, field
 from typing import Any, Literal
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
 load_dotenv()
 
 Topology = Literal["mesh", "server_authoritative"]
@@ -24,6 +32,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("simple_webrtc.server")
 
+EMIT_LEGACY_LOBBY_LIST: bool = os.getenv("EMIT_LEGACY_LOBBY_LIST", "0") == "1"
+
 DEFAULT_ICE_SERVERS: list[dict[str, Any]] = [
     {"urls": ["stun:stun.l.google.com:19302"]},
 ]
@@ -56,14 +66,6 @@ def _load_ice_servers() -> list[dict[str, Any]]:
     return validated
 
 
-@dataclass(slots=True)
-class PeerSession:
-    peer_id: int
-    websocket: WebSocket
-    room_id: str
-    joined_at: float = field(default_factory=lambda: time.time())
-
-
 @dataclass(slots=True)
 class LobbySubscription:
     connection_id: int
@@ -81,6 +83,7 @@ class Room:
     peer_ids: set[int] = field(default_factory=set)
     connected_ack: set[int] = field(default_factory=set)
     tags: list[str] = field(default_factory=list)
+    tags_set: frozenset[str] = field(default_factory=frozenset)
     last_activity: float = field(default_factory=lambda: time.time())
 
     def update_activity(self) -> None:
@@ -92,13 +95,26 @@ class Room:
 
 
 class Registry:
+    # Mutated only from the event loop and never across an await, so plain
+    # dict/set access is already serialized without an asyncio.Lock.
     def __init__(self) -> None:
         self.rooms: dict[str, Room] = {}
-        self.peers: dict[int, PeerSession] = {}
+        # Peer state is split by access pattern: relay and broadcast only
+        # touch peer_ws/peer_room, while (joined_at, client_label) stays cold.
+        self.peer_ws: dict[int, WebSocket] = {}
+        self.peer_room: dict[int, str] = {}
+        self.peer_meta: dict[int, tuple[float, str]] = {}
         self.lobby_subscriptions: dict[int, LobbySubscription] = {}
+        self.tag_to_subs: dict[str, set[int]] = {}
+        self.unfiltered_subs: set[int] = set()
+        self.activity_heap: list[tuple[float, int, Room]] = []
+        self._heap_sequence: itertools.count[int] = itertools.count()
+        self.pending_notifications: set[asyncio.Task[None]] = set()
+        self.lobby_snapshot_cache: dict[
+            frozenset[str], tuple[list[dict[str, Any]], str]
+        ] = {}
         self._next_peer_id: int = 1
         self._next_connection_id: int = 1
-        self.lock: asyncio.Lock = asyncio.Lock()
 
     def allocate_peer_id(self) -> int:
         peer_id: int = self._next_peer_id
@@ -110,11 +126,110 @@ class Registry:
         self._next_connection_id += 1
         return connection_id
 
+    def add_peer(
+        self, peer_id: int, websocket: WebSocket, room_id: str, client_label: str
+    ) -> None:
+        self.peer_ws[peer_id] = websocket
+        self.peer_room[peer_id] = room_id
+        self.peer_meta[peer_id] = (time.time(), client_label)
+
+    def remove_peer(self, peer_id: int) -> str | None:
+        self.peer_ws.pop(peer_id, None)
+        self.peer_meta.pop(peer_id, None)
+        return self.peer_room.pop(peer_id, None)
+
+    def peer_client_label(self, peer_id: int) -> str | None:
+        meta: tuple[float, str] | None = self.peer_meta.get(peer_id)
+        return meta[1] if meta is not None else None
+
+    def invalidate_lobby_snapshots(self) -> None:
+        self.lobby_snapshot_cache.clear()
+
+    def schedule_room(self, room: Room) -> None:
+        heapq.heappush(
+            self.activity_heap,
+            (room.last_activity, next(self._heap_sequence), room),
+        )
+
+    def pop_stale_rooms(self, cutoff: float) -> list[Room]:
+        # Each live room has exactly one heap entry. Entries are not moved on
+        # every activity update; instead a room whose entry expired but was
+        # touched since is rescheduled here with its current timestamp.
+        stale_rooms: list[Room] = []
+        heap: list[tuple[float, int, Room]] = self.activity_heap
+        while heap and heap[0][0] < cutoff:
+            _, _, room = heapq.heappop(heap)
+            if self.rooms.get(room.room_id) is not room:
+                continue
+            if room.last_activity >= cutoff:
+                self.schedule_room(room)
+                continue
+            del self.rooms[room.room_id]
+            stale_rooms.append(room)
+        return stale_rooms
+
+    def add_lobby_subscription(self, subscription: LobbySubscription) -> None:
+        self.remove_lobby_subscription(subscription.connection_id)
+        self.lobby_subscriptions[subscription.connection_id] = subscription
+        if not subscription.filter_tags:
+            self.unfiltered_subs.add(subscription.connection_id)
+            return
+        for tag in subscription.filter_tags:
+            self.tag_to_subs.setdefault(tag, set()).add(subscription.connection_id)
+
+    def remove_lobby_subscription(self, connection_id: int) -> None:
+        subscription: LobbySubscription | None = self.lobby_subscriptions.pop(
+            connection_id, None
+        )
+        if subscription is None:
+            return
+        self.unfiltered_subs.discard(connection_id)
+        for tag in subscription.filter_tags:
+            subscribers: set[int] | None = self.tag_to_subs.get(tag)
+            if subscribers is None:
+                continue
+            subscribers.discard(connection_id)
+            if not subscribers:
+                del self.tag_to_subs[tag]
+
+    def lobby_subscribers_for(self, tags: frozenset[str]) -> list[LobbySubscription]:
+        candidate_ids: set[int] = set(self.unfiltered_subs)
+        for tag in tags:
+            subscribers: set[int] | None = self.tag_to_subs.get(tag)
+            if subscribers:
+                candidate_ids |= subscribers
+
+        matched: list[LobbySubscription] = []
+        for connection_id in candidate_ids:
+            subscription: LobbySubscription | None = self.lobby_subscriptions.get(
+                connection_id
+            )
+            if subscription is not None and subscription.filter_tags <= tags:
+                matched.append(subscription)
+        return matched
+
 
 app = FastAPI(title="SimpleWebRTC Signaling Server", version="2.0.0")
 registry = Registry()
 ICE_SERVERS: list[dict[str, Any]] = _load_ice_servers()
 START_TIME: float = time.time()
+LOBBY_SNAPSHOT_CACHE_SIZE: int = 256
+HEALTH_BODY: bytes = b'{"status":"ok"}'
+ROOT_HTML: bytes = b"""
+        <html>
+            <head><title>SimpleWebRTC Signaling</title></head>
+            <body style="font-family: sans-serif; margin: 2rem;">
+                <h1>SimpleWebRTC Signaling Server</h1>
+                <p>Server is running.</p>
+                <ul>
+                    <li><a href="/heartbeat">/heartbeat</a></li>
+                    <li><a href="/health">/health</a></li>
+                    <li><a href="/lobbies">/lobbies</a></li>
+                </ul>
+                <p>WebSocket endpoint: <code>/ws</code></p>
+            </body>
+        </html>
+        """
 
 
 def _client_label(websocket: WebSocket) -> str:
@@ -124,36 +239,74 @@ def _client_label(websocket: WebSocket) -> str:
     return f"{client.host}:{client.port}"
 
 
+def encode_json(payload: dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(payload).decode("utf-8")
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def decode_json(data: str | bytes) -> Any:
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson reports bad UTF-8 as a JSON error; re-check on the failure
+            # path only so bytes input raises UnicodeDecodeError like json.loads.
+            if isinstance(data, bytes):
+                data.decode("utf-8")
+            raise
+    return json.loads(data)
+
+
+async def send_prepared(websocket: WebSocket, data: str) -> None:
+    await websocket.send_text(data)
+
+
 async def send_json(websocket: WebSocket, payload: dict[str, Any]) -> None:
-    await websocket.send_json(payload)
+    await send_prepared(websocket, encode_json(payload))
 
 
-async def send_error(websocket: WebSocket, message: str) -> None:
-    logger.warning(
-        "Sending protocol error to %s: %s", _client_label(websocket), message
-    )
+async def send_error(
+    websocket: WebSocket, message: str, client_label: str | None = None
+) -> None:
+    if logger.isEnabledFor(logging.WARNING):
+        logger.warning(
+            "Sending protocol error to %s: %s",
+            client_label or _client_label(websocket),
+            message,
+        )
     await send_json(websocket, {"type": "error", "message": message})
 
 
 async def broadcast_room(
     room: Room, payload: dict[str, Any], exclude_peer_id: int | None = None
 ) -> None:
-    send_tasks: list[asyncio.Task[Any]] = []
+    data: str = encode_json(payload)
+    get_ws = registry.peer_ws.get
+    send_coros: list[Coroutine[Any, Any, None]] = []
     for peer_id in room.peer_ids:
         if exclude_peer_id is not None and peer_id == exclude_peer_id:
             continue
-        peer_session: PeerSession | None = registry.peers.get(peer_id)
-        if peer_session is None:
+        peer_websocket: WebSocket | None = get_ws(peer_id)
+        if peer_websocket is None:
             continue
-        send_tasks.append(
-            asyncio.create_task(send_json(peer_session.websocket, payload))
-        )
+        send_coros.append(send_prepared(peer_websocket, data))
+
+    if not send_coros:
+        return
 
-    if send_tasks:
-        results = await asyncio.gather(*send_tasks, return_exceptions=True)
-        for result in results:
-            if isinstance(result, Exception):
-                logger.debug("Broadcast send raised exception: %s", result)
+    # Two-player rooms usually leave a single recipient; skip gather there.
+    if len(send_coros) == 1:
+        try:
+            await send_coros[0]
+        except Exception as exc:
+            logger.debug("Broadcast send raised exception: %s", exc)
+        return
+
+    results = await asyncio.gather(*send_coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.debug("Broadcast send raised exception: %s", result)
 
 
 def room_to_lobby(room: Room) -> dict[str, Any]:
@@ -169,19 +322,19 @@ def room_to_lobby(room: Room) -> dict[str, Any]:
 def _normalize_filter_tags(raw_tags: Any) -> set[str]:
     if not isinstance(raw_tags, list):
         return set()
-    return {str(item).strip() for item in raw_tags if str(item).strip()}
+    return {tag for item in raw_tags if (tag := str(item).strip())}
 
 
 def _is_room_visible_to_filter(room: Room, filter_tags: set[str]) -> bool:
     if room.is_sealed or room.is_full:
         return False
-    if filter_tags and not filter_tags.issubset(set(room.tags)):
+    if filter_tags and not filter_tags.issubset(room.tags_set):
         return False
     return True
 
 
 def _build_lobby_snapshot(
-    rooms: list[Room], filter_tags: set[str]
+    rooms: Iterable[Room], filter_tags: set[str]
 ) -> list[dict[str, Any]]:
     return [
         room_to_lobby(room)
@@ -190,17 +343,36 @@ def _build_lobby_snapshot(
     ]
 
 
+def _get_lobby_snapshot(filter_tags: set[str]) -> tuple[list[dict[str, Any]], str]:
+    # Returns the lobby list and its pre-encoded lobby_snapshot frame, reused
+    # until the next room mutation invalidates the cache.
+    cache_key: frozenset[str] = frozenset(filter_tags)
+    cached: tuple[list[dict[str, Any]], str] | None = (
+        registry.lobby_snapshot_cache.get(cache_key)
+    )
+    if cached is not None:
+        return cached
+
+    lobbies: list[dict[str, Any]] = _build_lobby_snapshot(
+        registry.rooms.values(), filter_tags
+    )
+    data: str = encode_json({"type": "lobby_snapshot", "lobbies": lobbies})
+    if len(registry.lobby_snapshot_cache) >= LOBBY_SNAPSHOT_CACHE_SIZE:
+        registry.lobby_snapshot_cache.clear()
+    registry.lobby_snapshot_cache[cache_key] = (lobbies, data)
+    return lobbies, data
+
+
 @app.get("/health")
-async def health() -> dict[str, str]:
-    return {"status": "ok"}
+async def health() -> Response:
+    return Response(content=HEALTH_BODY, media_type="application/json")
 
 
 @app.get("/heartbeat")
 async def heartbeat() -> dict[str, Any]:
     now: float = time.time()
-    async with registry.lock:
-        rooms_count: int = len(registry.rooms)
-        peers_count: int = len(registry.peers)
+    rooms_count: int = len(registry.rooms)
+    peers_count: int = len(registry.peer_ws)
 
     return {
         "status": "ok",
@@ -213,22 +385,8 @@ async def heartbeat() -> dict[str, Any]:
 
 
 @app.get("/", response_class=HTMLResponse)
-async def root_status() -> str:
-    return """
-        <html>
-            <head><title>SimpleWebRTC Signaling</title></head>
-            <body style=\"font-family: sans-serif; margin: 2rem;\">
-                <h1>SimpleWebRTC Signaling Server</h1>
-                <p>Server is running.</p>
-                <ul>
-                    <li><a href=\"/heartbeat\">/heartbeat</a></li>
-                    <li><a href=\"/health\">/health</a></li>
-                    <li><a href=\"/lobbies\">/lobbies</a></li>
-                </ul>
-                <p>WebSocket endpoint: <code>/ws</code></p>
-            </body>
-        </html>
-        """
+async def root_status() -> HTMLResponse:
+    return HTMLResponse(content=ROOT_HTML)
 
 
 @app.websocket("/ws")
@@ -301,26 +459,19 @@ async def receive_client_message(websocket: WebSocket) -> dict[str, Any] | None:
     if message_type == "websocket.disconnect":
         raise WebSocketDisconnect(code=int(raw_message.get("code", 1000)))
 
-    payload_text: str | None = raw_message.get("text")
-    payload_bytes: bytes | None = raw_message.get("bytes")
-
-    if payload_text is None and payload_bytes is None:
-        await send_error(websocket, "empty_payload")
-        return None
-
-    if payload_text is None and payload_bytes is not None:
-        try:
-            payload_text = payload_bytes.decode("utf-8")
-        except UnicodeDecodeError:
-            await send_error(websocket, "invalid_utf8_payload")
-            return None
+    payload: str | bytes | None = raw_message.get("text")
+    if payload is None:
+        payload = raw_message.get("bytes")
 
-    if payload_text is None:
+    if payload is None:
         await send_error(websocket, "empty_payload")
         return None
 
     try:
-        parsed: Any = json.loads(payload_text)
+        parsed: Any = decode_json(payload)
+    except UnicodeDecodeError:
+        await send_error(websocket, "invalid_utf8_payload")
+        return None
     except json.JSONDecodeError:
         await send_error(websocket, "invalid_json")
         return None
@@ -351,67 +502,66 @@ async def handle_join(websocket: WebSocket, message: dict[str, Any]) -> int | No
         await send_error(websocket, "room_id_required")
         return None
 
-    async with registry.lock:
-        peer_id: int = registry.allocate_peer_id()
-        room: Room | None = registry.rooms.get(room_id)
-
-        if room is None:
-            if not is_host_intent:
-                await send_error(websocket, "room_not_found")
-                return None
-            room = Room(
-                room_id=room_id,
-                host_id=peer_id,
-                topology=topology,
-                capacity=capacity,
-                tags=tags,
-            )
-            registry.rooms[room_id] = room
-            logger.info(
-                "Room created: room_id=%s host_id=%d topology=%s capacity=%d",
-                room_id,
-                peer_id,
-                topology,
-                capacity,
-            )
-        elif topology != room.topology:
-            logger.warning(
-                "Rejected join due to topology mismatch: room_id=%s requested=%s actual=%s",
-                room_id,
-                topology,
-                room.topology,
-            )
-            await send_error(websocket, "topology_mismatch")
-            return None
-
-        if room.is_sealed or room.is_full:
-            await send_error(websocket, "room_unavailable")
-            return None
+    peer_id: int = registry.allocate_peer_id()
+    room: Room | None = registry.rooms.get(room_id)
 
-        if is_host_intent and room.host_id != peer_id:
-            await send_error(websocket, "host_already_exists")
+    if room is None:
+        if not is_host_intent:
+            await send_error(websocket, "room_not_found")
             return None
-
-        room.peer_ids.add(peer_id)
-        room.update_activity()
-        if room.is_full:
-            room.is_sealed = True
-
-        registry.peers[peer_id] = PeerSession(
-            peer_id=peer_id, websocket=websocket, room_id=room_id
+        room = Room(
+            room_id=room_id,
+            host_id=peer_id,
+            topology=topology,
+            capacity=capacity,
+            tags=tags,
+            tags_set=frozenset(tags),
         )
-        existing_peers: list[int] = [pid for pid in room.peer_ids if pid != peer_id]
-
+        registry.rooms[room_id] = room
+        registry.schedule_room(room)
         logger.info(
-            "Peer joined: peer_id=%d room_id=%s host=%s players=%d/%d",
+            "Room created: room_id=%s host_id=%d topology=%s capacity=%d",
+            room_id,
             peer_id,
+            topology,
+            capacity,
+        )
+    elif topology != room.topology:
+        logger.warning(
+            "Rejected join due to topology mismatch: room_id=%s requested=%s actual=%s",
             room_id,
-            peer_id == room.host_id,
-            len(room.peer_ids),
-            room.capacity,
+            topology,
+            room.topology,
         )
+        await send_error(websocket, "topology_mismatch")
+        return None
 
-    await notify_lobby_room_changed(room_id)
+    if room.is_sealed or room.is_full:
+        await send_error(websocket, "room_unavailable")
+        return None
+
+    if is_host_intent and room.host_id != peer_id:
+        await send_error(websocket, "host_already_exists")
+        return None
+
+    existing_peers: tuple[int, ...] = tuple(room.peer_ids)
+    room.peer_ids.add(peer_id)
+    room.update_activity()
+    if room.is_full:
+        room.is_sealed = True
+    registry.invalidate_lobby_snapshots()
+
+    registry.add_peer(peer_id, websocket, room_id, _client_label(websocket))
+    logger.info(
+        "Peer joined: peer_id=%d room_id=%s host=%s players=%d/%d",
+        peer_id,
+        room_id,
+        peer_id == room.host_id,
+        len(room.peer_ids),
+        room.capacity,
+    )
+
+    schedule_lobby_notification(room)
 
     await send_json(
         websocket,
@@ -425,20 +575,18 @@ async def handle_join(websocket: WebSocket, message: dict[str, Any]) -> int | No
         },
     )
 
-    notify_peer_ids: list[int] = []
+    notify_peer_ids: tuple[int, ...] = ()
     if room.topology == "mesh":
         notify_peer_ids = existing_peers
     else:
         if room.host_id in existing_peers:
-            notify_peer_ids = [room.host_id]
+            notify_peer_ids = (room.host_id,)
 
     for existing_peer_id in notify_peer_ids:
-        existing_session: PeerSession | None = registry.peers.get(existing_peer_id)
-        if existing_session is None:
+        existing_websocket: WebSocket | None = registry.peer_ws.get(existing_peer_id)
+        if existing_websocket is None:
             continue
-        await send_json(
-            existing_session.websocket, {"type": "peer_joined", "peer_id": peer_id}
-        )
+        await send_json(existing_websocket, {"type": "peer_joined", "peer_id": peer_id})
 
     if room.is_full:
         await maybe_emit_match_ready(room_id)
@@ -449,14 +597,12 @@ async def handle_join(websocket: WebSocket, message: dict[str, Any]) -> int | No
 async def handle_list_lobbies(websocket: WebSocket, message: dict[str, Any]) -> None:
     tags: set[str] = _normalize_filter_tags(message.get("filter_tags", []))
 
-    async with registry.lock:
-        lobbies: list[dict[str, Any]] = _build_lobby_snapshot(
-            list(registry.rooms.values()), tags
-        )
+    lobbies, snapshot_data = _get_lobby_snapshot(tags)
 
-    # Keep legacy lobby_list for compatibility and include new snapshot event.
-    await send_json(websocket, {"type": "lobby_list", "lobbies": lobbies})
-    await send_json(websocket, {"type": "lobby_snapshot", "lobbies": lobbies})
+    # Legacy lobby_list duplicates the snapshot payload; only send it on opt-in.
+    if EMIT_LEGACY_LOBBY_LIST:
+        await send_json(websocket, {"type": "lobby_list", "lobbies": lobbies})
+    await send_prepared(websocket, snapshot_data)
 
 
 async def handle_subscribe_lobbies(
@@ -464,136 +610,158 @@ async def handle_subscribe_lobbies(
 ) -> None:
     filter_tags: set[str] = _normalize_filter_tags(message.get("filter_tags", []))
 
-    async with registry.lock:
-        registry.lobby_subscriptions[connection_id] = LobbySubscription(
+    registry.add_lobby_subscription(
+        LobbySubscription(
             connection_id=connection_id,
             websocket=websocket,
             filter_tags=filter_tags,
         )
-        lobbies: list[dict[str, Any]] = _build_lobby_snapshot(
-            list(registry.rooms.values()), filter_tags
-        )
+    )
+    _, snapshot_data = _get_lobby_snapshot(filter_tags)
 
-    await send_json(websocket, {"type": "lobby_snapshot", "lobbies": lobbies})
+    await send_prepared(websocket, snapshot_data)
 
 
 async def handle_unsubscribe_lobbies(connection_id: int) -> None:
-    async with registry.lock:
-        registry.lobby_subscriptions.pop(connection_id, None)
+    registry.remove_lobby_subscription(connection_id)
 
 
-async def notify_lobby_room_changed(room_id: str) -> None:
-    async with registry.lock:
-        room: Room | None = registry.rooms.get(room_id)
-        subscriptions: list[LobbySubscription] = list(
-            registry.lobby_subscriptions.values()
-        )
+async def notify_lobby_room_changed(room: Room) -> None:
+    # Only subscribers whose filter is a subset of the room's tags ever see
+    # this room, so the tag index narrows the fan-out before any encoding.
+    subscriptions: list[LobbySubscription] = registry.lobby_subscribers_for(
+        room.tags_set
+    )
+    if not subscriptions:
+        return
 
-    send_tasks: list[asyncio.Task[Any]] = []
-    for subscription in subscriptions:
-        if room is not None and _is_room_visible_to_filter(
-            room, subscription.filter_tags
-        ):
-            payload: dict[str, Any] = {
+    is_live: bool = registry.rooms.get(room.room_id) is room
+    if is_live and not (room.is_sealed or room.is_full):
+        data: str = encode_json(
+            {
                 "type": "lobby_delta",
                 "op": "upsert",
                 "room_id": room.room_id,
                 "lobby": room_to_lobby(room),
             }
-        else:
-            payload = {
-                "type": "lobby_delta",
-                "op": "remove",
-                "room_id": room_id,
-            }
-        send_tasks.append(
-            asyncio.create_task(send_json(subscription.websocket, payload))
         )
+    else:
+        data = encode_json(
+            {"type": "lobby_delta", "op": "remove", "room_id": room.room_id}
+        )
+
+    send_coros: list[Coroutine[Any, Any, None]] = [
+        send_prepared(subscription.websocket, data) for subscription in subscriptions
+    ]
 
-    if send_tasks:
-        results = await asyncio.gather(*send_tasks, return_exceptions=True)
-        for result in results:
-            if isinstance(result, Exception):
-                logger.debug("Lobby delta send raised exception: %s", result)
+    results = await asyncio.gather(*send_coros, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception):
+            logger.debug("Lobby delta send raised exception: %s", result)
+
+
+def schedule_lobby_notification(room: Room) -> None:
+    # Lobby deltas are fire-and-forget so joins and disconnects are not held
+    # up by fan-out to every lobby subscriber.
+    task: asyncio.Task[None] = asyncio.create_task(notify_lobby_room_changed(room))
+    registry.pending_notifications.add(task)
+    task.add_done_callback(_on_lobby_notification_done)
+
+
+def _on_lobby_notification_done(task: asyncio.Task[None]) -> None:
+    registry.pending_notifications.discard(task)
+    if task.cancelled():
+        return
+    exc: BaseException | None = task.exception()
+    if exc is not None:
+        logger.error("Lobby notification failed", exc_info=exc)
 
 
 async def handle_signal(from_peer_id: int, message: dict[str, Any]) -> None:
+    # Highest-frequency path (SDP/ICE relay): bind the lookups once.
+    get_ws = registry.peer_ws.get
     target_id: int = int(message.get("target_id", 0))
+    source_websocket: WebSocket | None = get_ws(from_peer_id)
     if target_id == 0:
-        source_session: PeerSession | None = registry.peers.get(from_peer_id)
-        if source_session is not None:
-            await send_error(source_session.websocket, "target_id_required")
+        if source_websocket is not None:
+            await send_error(
+                source_websocket,
+                "target_id_required",
+                registry.peer_client_label(from_peer_id),
+            )
         return
 
-    async with registry.lock:
-        source_session = registry.peers.get(from_peer_id)
-        target_session = registry.peers.get(target_id)
-        if source_session is None or target_session is None:
-            return
+    target_websocket: WebSocket | None = get_ws(target_id)
+    if source_websocket is None or target_websocket is None:
+        return
 
-        if source_session.room_id != target_session.room_id:
-            logger.warning(
-                "Blocked cross-room signal: from_peer=%d(%s) to_peer=%d(%s)",
-                from_peer_id,
-                source_session.room_id,
-                target_id,
-                target_session.room_id,
-            )
-            await send_error(source_session.websocket, "cross_room_signal_blocked")
-            return
+    source_room_id: str = registry.peer_room[from_peer_id]
+    target_room_id: str = registry.peer_room[target_id]
+    if source_room_id != target_room_id:
+        logger.warning(
+            "Blocked cross-room signal: from_peer=%d(%s) to_peer=%d(%s)",
+            from_peer_id,
+            source_room_id,
+            target_id,
+            target_room_id,
+        )
+        await send_error(
+            source_websocket,
+            "cross_room_signal_blocked",
+            registry.peer_client_label(from_peer_id),
+        )
+        return
 
-        room: Room | None = registry.rooms.get(source_session.room_id)
-        if room is None:
-            return
-        room.update_activity()
+    room: Room | None = registry.rooms.get(source_room_id)
+    if room is None:
+        return
+    room.update_activity()
 
-        relay_payload: dict[str, Any] = {
-            "type": "signal",
-            "from_id": from_peer_id,
-        }
-        if "sdp" in message:
-            relay_payload["sdp"] = message["sdp"]
-        if "ice" in message:
-            relay_payload["ice"] = message["ice"]
+    relay_payload: dict[str, Any] = {
+        "type": "signal",
+        "from_id": from_peer_id,
+    }
+    if "sdp" in message:
+        relay_payload["sdp"] = message["sdp"]
+    if "ice" in message:
+        relay_payload["ice"] = message["ice"]
 
-    await send_json(target_session.websocket, relay_payload)
+    await send_json(target_websocket, relay_payload)
 
 
 async def handle_peer_connected(peer_id: int) -> None:
-    async with registry.lock:
-        session: PeerSession | None = registry.peers.get(peer_id)
-        if session is None:
-            return
-        room: Room | None = registry.rooms.get(session.room_id)
-        if room is None:
-            return
-        room.connected_ack.add(peer_id)
-        room.update_activity()
-        logger.info(
-            "Peer connection ack: peer_id=%d room_id=%s acks=%d/%d",
-            peer_id,
-            session.room_id,
-            len(room.connected_ack),
-            len(room.peer_ids),
-        )
+    room_id: str | None = registry.peer_room.get(peer_id)
+    if room_id is None:
+        return
+    room: Room | None = registry.rooms.get(room_id)
+    if room is None:
+        return
+    room.connected_ack.add(peer_id)
+    room.update_activity()
+    logger.debug(
+        "Peer connection ack: peer_id=%d room_id=%s acks=%d/%d",
+        peer_id,
+        room_id,
+        len(room.connected_ack),
+        len(room.peer_ids),
+    )
 
-    await maybe_emit_match_ready(session.room_id)
+    await maybe_emit_match_ready(room_id)
 
 
 async def maybe_emit_match_ready(room_id: str) -> None:
-    async with registry.lock:
-        room: Room | None = registry.rooms.get(room_id)
-        if room is None:
-            return
+    room: Room | None = registry.rooms.get(room_id)
+    if room is None:
+        return
 
-        if not room.is_full:
-            return
+    if not room.is_full:
+        return
 
-        if len(room.connected_ack) < len(room.peer_ids):
-            return
+    if len(room.connected_ack) < len(room.peer_ids):
+        return
 
-        payload: dict[str, Any] = {"type": "match_ready"}
-        room.update_activity()
+    payload: dict[str, Any] = {"type": "match_ready"}
+    room.update_activity()
 
     logger.info("Match ready: room_id=%s players=%d", room_id, len(room.peer_ids))
 
@@ -601,41 +769,41 @@ async def maybe_emit_match_ready(room_id: str) -> None:
 
 
 async def handle_disconnect(peer_id: int) -> None:
-    async with registry.lock:
-        session: PeerSession | None = registry.peers.pop(peer_id, None)
-        if session is None:
-            return
-        room: Room | None = registry.rooms.get(session.room_id)
-        if room is None:
-            return
-
-        room.peer_ids.discard(peer_id)
-        room.connected_ack.discard(peer_id)
-        room.update_activity()
+    room_id: str | None = registry.remove_peer(peer_id)
+    if room_id is None:
+        return
+    room: Room | None = registry.rooms.get(room_id)
+    if room is None:
+        return
 
-        host_disconnected: bool = peer_id == room.host_id
-        is_empty: bool = len(room.peer_ids) == 0
-        peers_left: list[int] = list(room.peer_ids)
+    room.peer_ids.discard(peer_id)
+    room.connected_ack.discard(peer_id)
+    room.update_activity()
 
-        if host_disconnected or is_empty:
-            registry.rooms.pop(room.room_id, None)
-        else:
-            room.is_sealed = False
+    host_disconnected: bool = peer_id == room.host_id
+    is_empty: bool = len(room.peer_ids) == 0
+    peers_left: list[int] = list(room.peer_ids)
 
-        logger.info(
-            "Peer disconnected: peer_id=%d room_id=%s host_disconnected=%s remaining=%d",
-            peer_id,
-            room.room_id,
-            host_disconnected,
-            len(peers_left),
-        )
+    if host_disconnected or is_empty:
+        registry.rooms.pop(room.room_id, None)
+    else:
+        room.is_sealed = False
+    registry.invalidate_lobby_snapshots()
+
+    logger.info(
+        "Peer disconnected: peer_id=%d room_id=%s host_disconnected=%s remaining=%d",
+        peer_id,
+        room.room_id,
+        host_disconnected,
+        len(peers_left),
+    )
 
     if host_disconnected:
         await broadcast_room(room, {"type": "room_closed"})
     elif peers_left:
         await broadcast_room(room, {"type": "peer_left", "peer_id": peer_id})
 
-    await notify_lobby_room_changed(room.room_id)
+    schedule_lobby_notification(room)
 
 
 @app.on_event("startup")
@@ -651,6 +819,12 @@ async def shutdown_event() -> None:
         prune_task.cancel()
         with contextlib.suppress(asyncio.CancelledError):
             await prune_task
+    pending_notifications: list[asyncio.Task[None]] = list(
+        registry.pending_notifications
+    )
+    for task in pending_notifications:
+        task.cancel()
+    await asyncio.gather(*pending_notifications, return_exceptions=True)
     logger.info("Server shutdown complete")
 
 
@@ -660,23 +834,18 @@ async def prune_stale_rooms() -> None:
         await asyncio.sleep(60.0)
         now: float = time.time()
 
-        async with registry.lock:
-            stale_room_ids: list[str] = [
-                room_id
-                for room_id, room in registry.rooms.items()
-                if now - room.last_activity > stale_after_seconds
-            ]
-
-            for room_id in stale_room_ids:
-                room: Room = registry.rooms.pop(room_id)
-                for peer_id in list(room.peer_ids):
-                    registry.peers.pop(peer_id, None)
-                logger.info(
-                    "Pruned stale room: room_id=%s inactive_for=%.1fs removed_peers=%d",
-                    room_id,
-                    now - room.last_activity,
-                    len(room.peer_ids),
-                )
-
-        for room_id in stale_room_ids:
-            await notify_lobby_room_changed(room_id)
+        stale_rooms: list[Room] = registry.pop_stale_rooms(now - stale_after_seconds)
+        if stale_rooms:
+            registry.invalidate_lobby_snapshots()
+        for room in stale_rooms:
+            for peer_id in list(room.peer_ids):
+                registry.remove_peer(peer_id)
+            logger.info(
+                "Pruned stale room: room_id=%s inactive_for=%.1fs removed_peers=%d",
+                room.room_id,
+                now - room.last_activity,
+                len(room.peer_ids),
+            )
+
+        for room in stale_rooms:
+            schedule_lobby_notification(room)